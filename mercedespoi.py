@@ -11,19 +11,40 @@ Usage:
     ./mercedespoi.py --region antwerp -o antwerp.gpx
     ./mercedespoi.py --input local.json -o offline.gpx
     ./mercedespoi.py --split --region belgium -o speedcams.gpx
+    ./mercedespoi.py --corridor trip.gpx --corridor-width 300 -o trip.gpx
+
+As a library, chain the lazy stages with pipeline(), e.g.
+    write_mercedes_gpx(iter_speedcam_pois(iter_documents(regions=["antwerp"])),
+                       "antwerp.gpx")
 """
 
 import argparse
+import http.client
 import json
+import logging
 import math
 import os
+import queue
 import re
+import socket
+import sqlite3
+import struct
 import sys
-import urllib.request
-import urllib.error
+import threading
+import time
+import urllib.parse
+import xml.etree.ElementTree as ET
+import zlib
 
 OVERPASS_API = "https://overpass-api.de/api/interpreter"
 
+# Public Overpass instances, tried in order of health (see OverpassTransport)
+OVERPASS_MIRRORS = [
+    OVERPASS_API,
+    "https://overpass.kumi.systems/api/interpreter",
+    "https://overpass.private.coffee/api/interpreter",
+]
+
 # Region definitions: name → Overpass area selector
 # Area IDs: 3600000000 + OSM relation ID
 # Belgium = 52411, Netherlands = 47796, Luxembourg = 2171347
@@ -34,8 +55,27 @@ REGIONS = {
     "antwerp": 'area["name"="Antwerpen"]["admin_level"="6"]->.searchArea;',
 }
 
+log = logging.getLogger("mercedespoi")
+
 COMAND_POI_LIMIT = 30000
 
+# Default half-width of the --corridor filter, in meters either side of the track
+DEFAULT_CORRIDOR_WIDTH = 500
+
+# GeoPackage constants (OGC 12-128r18): "GPKG" application id, version 1.3
+GPKG_APPLICATION_ID = 0x47504B47
+GPKG_USER_VERSION = 10300
+WGS84_SRS_ID = 4326
+
+# Tolerance (in tiles) for float division when assigning POIs to --tiles tiles
+TILE_EPSILON = 1e-9
+
+# Hilbert curve resolution for tile split ordering (2^16 cells ≈ 300 m per side)
+HILBERT_ORDER = 16
+
+# Mean meters per degree of latitude (R * pi / 180, same R as haversine_m)
+METERS_PER_DEG_LAT = 111194.9
+
 # Speed zone definitions for --split mode
 # Activity value in seconds — speed-adaptive: triggers N seconds before reaching POI.
 SPEED_ZONES = {
@@ -49,6 +89,9 @@ SPEED_ZONES = {
 }
 # Default zone for cameras with unknown or unusual maxspeed
 DEFAULT_ZONE = {"category": "Speedcam", "icon": 6, "value": "36", "unit": "second"}
+# Category and icon for single-file (unsplit) output
+DEFAULT_CATEGORY = "Speedcamera"
+DEFAULT_ICON = 6
 
 # Trajectory (average speed) zone settings
 # Entry: full warning (sound + visual) — you're entering an enforced section
@@ -111,27 +154,402 @@ def build_query(region):
     )
 
 
-def fetch_overpass(query):
-    """POST query to Overpass API, return parsed JSON."""
-    data = f"data={query}".encode("utf-8")
-    req = urllib.request.Request(
-        OVERPASS_API,
-        data=data,
-        headers={"Content-Type": "application/x-www-form-urlencoded; charset=UTF-8"},
-    )
-    print("Fetching data from Overpass API...", file=sys.stderr)
-    try:
-        with urllib.request.urlopen(req, timeout=180) as resp:
-            raw = resp.read().decode("utf-8")
-    except urllib.error.HTTPError as e:
-        print(f"Error: Overpass API returned HTTP {e.code}", file=sys.stderr)
-        if e.code == 429:
-            print("Rate limited. Wait a moment and try again.", file=sys.stderr)
-        sys.exit(1)
-    except urllib.error.URLError as e:
-        print(f"Error: Could not reach Overpass API: {e.reason}", file=sys.stderr)
-        sys.exit(1)
-    return json.loads(raw)
+class OverpassError(Exception):
+    """Raised when no Overpass mirror returned a usable response."""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class _RetryableError(OverpassError):
+    """Failure that another attempt or another mirror may not hit."""
+
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message, status)
+        self.retry_after = retry_after
+
+
+class OverpassTransport:
+    """
+    HTTP transport for Overpass queries with mirror failover.
+
+    - Mirrors are tried healthiest first: a mirror that failed is put on a
+      cooldown (doubling per consecutive failure, or the server's Retry-After
+      on 429) and successful mirrors are ordered by smoothed latency.
+      Mirrors on cooldown are skipped; when all are cooling, the next retry
+      round waits for the first one to come back, unless that would run
+      past `deadline` seconds for the whole post().
+    - With hedge_after set, a second mirror is started if the first has not
+      answered within that many seconds; the first success wins and the
+      losing requests are aborted by closing their connections.
+    - Requests advertise gzip and the body is decompressed while streaming.
+    - Connections are kept alive and pooled per host, so multi-query runs
+      reuse TCP/TLS sessions.
+
+    HTTP 400 (query syntax) errors are not retried; 429, 5xx, timeouts and
+    truncated bodies fail over to the next mirror.
+    """
+
+    def __init__(self, mirrors=None, timeout=180, retries=2, backoff=2.0,
+                 hedge_after=None, deadline=600, user_agent="mercedespoi"):
+        self.mirrors = list(mirrors or OVERPASS_MIRRORS)
+        if not self.mirrors:
+            raise ValueError("at least one Overpass mirror is required")
+        for url in self.mirrors:
+            parts = urllib.parse.urlsplit(url)
+            if parts.scheme not in ("http", "https") or not parts.hostname:
+                raise ValueError(f"invalid Overpass mirror URL: {url!r} "
+                                 "(expected http:// or https://host/...)")
+        if hedge_after is not None and hedge_after < 0:
+            raise ValueError("hedge_after must not be negative")
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.hedge_after = hedge_after
+        self.deadline = deadline
+        self.user_agent = user_agent
+        self._lock = threading.Lock()
+        self._pool = {}
+        self._closed = False
+        self._health = {
+            url: {"failures": 0, "cooldown_until": 0.0, "latency": None}
+            for url in self.mirrors
+        }
+
+    # -- connection pool --------------------------------------------------
+
+    def _new_conn(self, url):
+        parts = urllib.parse.urlsplit(url)
+        cls = (http.client.HTTPSConnection if parts.scheme == "https"
+               else http.client.HTTPConnection)
+        return cls(parts.hostname, parts.port, timeout=self.timeout)
+
+    def _get_conn(self, url):
+        """Return (pool_key, connection, reused) for url."""
+        parts = urllib.parse.urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        with self._lock:
+            idle = self._pool.get(key)
+            if idle:
+                return key, idle.pop(), True
+        return key, self._new_conn(url), False
+
+    def _put_conn(self, key, conn):
+        with self._lock:
+            if not self._closed:
+                self._pool.setdefault(key, []).append(conn)
+                return
+        conn.close()
+
+    def close(self):
+        """Close all pooled connections; later requests are not pooled."""
+        with self._lock:
+            self._closed = True
+            pool, self._pool = self._pool, {}
+        for conns in pool.values():
+            for conn in conns:
+                conn.close()
+
+    # -- in-flight requests -----------------------------------------------
+
+    def _track(self, handle, conn):
+        """Record conn as handle's in-flight connection (no-op without handle)."""
+        if handle is None:
+            return
+        with self._lock:
+            handle["conn"] = conn
+            cancelled = handle["cancelled"]
+        if cancelled:
+            self._abort(conn)
+
+    def _release(self, handle, key, conn):
+        """Pool a finished connection unless its request was cancelled."""
+        if handle is not None:
+            with self._lock:
+                handle["conn"] = None
+                cancelled = handle["cancelled"]
+            if cancelled:
+                conn.close()
+                return
+        self._put_conn(key, conn)
+
+    def _cancel(self, handle):
+        """Abort the request behind handle; its thread sees a socket error."""
+        with self._lock:
+            handle["cancelled"] = True
+            conn, handle["conn"] = handle["conn"], None
+        if conn is not None:
+            self._abort(conn)
+
+    @staticmethod
+    def _abort(conn):
+        # shutdown() wakes a thread blocked in recv(); close() alone may not
+        sock = conn.sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        conn.close()
+
+    # -- health tracking --------------------------------------------------
+
+    def _ordered_mirrors(self):
+        """
+        Mirrors not on cooldown, fewest failures and fastest first.
+
+        Mirrors without a latency sample yet go after measured ones.
+        """
+        now = time.monotonic()
+        with self._lock:
+            health = {u: dict(h) for u, h in self._health.items()}
+        ready = [u for u in self.mirrors if health[u]["cooldown_until"] <= now]
+        ready.sort(key=lambda u: (health[u]["failures"],
+                                  health[u]["latency"] is None,
+                                  health[u]["latency"] or 0.0))
+        return ready
+
+    def _cooldown_remaining(self):
+        """Seconds until the first mirror comes off cooldown (0 if one is ready)."""
+        now = time.monotonic()
+        with self._lock:
+            earliest = min(h["cooldown_until"] for h in self._health.values())
+        return max(0.0, earliest - now)
+
+    def _record_latency(self, url, elapsed):
+        with self._lock:
+            h = self._health[url]
+            h["latency"] = (elapsed if h["latency"] is None
+                            else 0.7 * h["latency"] + 0.3 * elapsed)
+
+    def _mark_ok(self, url, elapsed):
+        with self._lock:
+            h = self._health[url]
+            h["failures"] = 0
+            h["cooldown_until"] = 0.0
+        self._record_latency(url, elapsed)
+
+    def _mark_failed(self, url, retry_after=None):
+        with self._lock:
+            h = self._health[url]
+            h["failures"] += 1
+            delay = retry_after or self.backoff * 2 ** (h["failures"] - 1)
+            h["cooldown_until"] = time.monotonic() + delay
+
+    # -- single request ---------------------------------------------------
+
+    def _post_once(self, url, body, handle=None):
+        parts = urllib.parse.urlsplit(url)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        headers = {
+            "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
+            "Accept-Encoding": "gzip",
+            "Connection": "keep-alive",
+            "User-Agent": self.user_agent,
+        }
+
+        key, conn, reused = self._get_conn(url)
+        self._track(handle, conn)
+        try:
+            try:
+                conn.request("POST", path, body=body, headers=headers)
+                resp = conn.getresponse()
+            except (http.client.RemoteDisconnected, BrokenPipeError,
+                    ConnectionResetError):
+                if not reused:
+                    raise
+                # Pooled keep-alive connection was closed by the server
+                conn.close()
+                conn = self._new_conn(url)
+                self._track(handle, conn)
+                conn.request("POST", path, body=body, headers=headers)
+                resp = conn.getresponse()
+
+            if resp.status != 200:
+                resp.read()
+                retry_after = resp.getheader("Retry-After")
+                conn.close()
+                msg = f"{url} returned HTTP {resp.status}"
+                if resp.status == 429 or resp.status >= 500:
+                    raise _RetryableError(
+                        msg, resp.status,
+                        float(retry_after) if retry_after and retry_after.isdigit()
+                        else None,
+                    )
+                raise OverpassError(msg, resp.status)
+
+            raw = self._read_body(resp)
+            if resp.will_close:
+                conn.close()
+            else:
+                self._release(handle, key, conn)
+        except OverpassError:
+            raise
+        except (OSError, http.client.HTTPException, zlib.error) as e:
+            conn.close()
+            raise _RetryableError(f"{url}: {e or type(e).__name__}")
+
+        try:
+            return json.loads(raw.decode("utf-8"))
+        except ValueError as e:
+            raise _RetryableError(f"{url}: invalid JSON response ({e})")
+
+    @staticmethod
+    def _read_body(resp, chunk_size=65536):
+        """Read a response body, decompressing gzip while streaming."""
+        gzipped = (resp.getheader("Content-Encoding") or "").lower() == "gzip"
+        decomp = zlib.decompressobj(16 + zlib.MAX_WBITS) if gzipped else None
+        chunks = []
+        while True:
+            chunk = resp.read(chunk_size)
+            if not chunk:
+                break
+            chunks.append(decomp.decompress(chunk) if decomp else chunk)
+        if decomp:
+            chunks.append(decomp.flush())
+            if not decomp.eof:
+                raise zlib.error("truncated gzip stream")
+        return b"".join(chunks)
+
+    def _attempt(self, url, body, handle=None):
+        t0 = time.monotonic()
+        try:
+            data = self._post_once(url, body, handle)
+        except Exception as e:
+            if handle is not None and handle["cancelled"]:
+                # Lost the hedge: not the mirror's fault, but charge the
+                # time it had used so it isn't tried first next time
+                self._record_latency(url, time.monotonic() - t0)
+            elif isinstance(e, _RetryableError):
+                self._mark_failed(url, e.retry_after)
+            raise
+        self._mark_ok(url, time.monotonic() - t0)
+        return data
+
+    # -- public API -------------------------------------------------------
+
+    def post(self, query):
+        """POST an Overpass QL query, return parsed JSON."""
+        body = urllib.parse.urlencode({"data": query}).encode("utf-8")
+        errors = []
+        started = time.monotonic()
+        for attempt in range(self.retries + 1):
+            wait = self._cooldown_remaining()
+            if wait:
+                elapsed = time.monotonic() - started
+                if self.deadline is not None and elapsed + wait > self.deadline:
+                    log.warning("  next mirror available in %.0f s, "
+                                "past the %g s deadline — giving up",
+                                wait, self.deadline)
+                    break
+                log.info("  all mirrors cooling down, waiting %.1f s", wait)
+                time.sleep(wait)
+            mirrors = self._ordered_mirrors()
+            if self.hedge_after is not None and len(mirrors) > 1:
+                data = self._post_hedged(mirrors, body, errors)
+                if data is not None:
+                    return data
+                continue
+            for url in mirrors:
+                try:
+                    return self._attempt(url, body)
+                except _RetryableError as e:
+                    errors.append(e)
+                    log.warning("  %s — trying next mirror", e)
+
+        statuses = {e.status for e in errors}
+        last = errors[-1] if errors else None
+        raise OverpassError(
+            f"all Overpass mirrors failed ({len(errors)} attempts, last: {last})",
+            429 if statuses == {429} else getattr(last, "status", None),
+        )
+
+    def _post_hedged(self, mirrors, body, errors):
+        """
+        Start mirrors staggered by hedge_after seconds; first success wins.
+
+        Attempts run on daemon threads so a hung mirror can't keep the
+        process alive; once a winner returns, the others are cancelled.
+        Returns None once every mirror has failed (errors are collected).
+        """
+        results = queue.Queue()
+        handles = []
+
+        def run(url, handle):
+            try:
+                results.put((self._attempt(url, body, handle), None))
+            except Exception as e:
+                results.put((None, e))
+
+        def start(url):
+            handle = {"conn": None, "cancelled": False}
+            handles.append(handle)
+            threading.Thread(target=run, args=(url, handle), daemon=True).start()
+
+        waiting = list(mirrors)
+        start(waiting.pop(0))
+        running = 1
+        try:
+            while running:
+                try:
+                    data, exc = results.get(
+                        timeout=self.hedge_after if waiting else None)
+                except queue.Empty:
+                    # Slow: start the next mirror alongside
+                    start(waiting.pop(0))
+                    running += 1
+                    continue
+                running -= 1
+                if exc is None:
+                    return data
+                if not isinstance(exc, _RetryableError):
+                    raise exc
+                errors.append(exc)
+                log.warning("  %s — trying next mirror", exc)
+                if waiting:
+                    start(waiting.pop(0))
+                    running += 1
+            return None
+        finally:
+            for handle in handles:
+                self._cancel(handle)
+
+
+_default_transport = None
+
+
+def fetch_overpass(query, transport=None):
+    """
+    POST query to Overpass API, return parsed JSON.
+
+    Uses a shared OverpassTransport (mirror failover, gzip, keep-alive)
+    unless one is given. Raises OverpassError if every mirror fails.
+    """
+    global _default_transport
+    if transport is None:
+        if _default_transport is None:
+            _default_transport = OverpassTransport()
+        transport = _default_transport
+    log.info("Fetching data from Overpass API...")
+    return transport.post(query)
+
+
+def iter_documents(regions=None, input_paths=None, transport=None):
+    """
+    Source stage: yield Overpass JSON documents.
+
+    Local files in input_paths are read first, then one query is fetched per
+    region. A single shared transport keeps connections alive across queries.
+    """
+    for path in input_paths or ():
+        log.info("Reading local file: %s", path)
+        with open(path, "r", encoding="utf-8") as f:
+            yield json.load(f)
+    for region in regions or ():
+        yield fetch_overpass(build_query(region), transport)
 
 
 def _resolve_entry_exit(members, nodes):
@@ -168,11 +586,15 @@ def _resolve_entry_exit(members, nodes):
     return entry_node, exit_node
 
 
-def parse_elements(data):
+def iter_elements(data, stats=None):
     """
-    Parse Overpass JSON into a list of POI dicts:
+    Parse Overpass JSON lazily, yielding POI dicts:
         {lat, lon, name, type, maxspeed, ...}
 
+    maxspeed is normalized while parsing (see normalize_maxspeed).
+    If a stats dict is given, "speed_cameras" and "trajectories" counters
+    in it are incremented as elements are consumed.
+
     For average_speed (trajectory) relations, emits TWO POIs: entry and exit,
     each with per-POI overrides for icon, category, and activity settings.
 
@@ -180,6 +602,11 @@ def parse_elements(data):
     Pass 2: Extract highway=speed_camera nodes.
     Pass 3: Resolve enforcement relations.
     """
+    if stats is None:
+        stats = {}
+    stats.setdefault("speed_cameras", 0)
+    stats.setdefault("trajectories", 0)
+
     elements = data.get("elements", [])
 
     # Pass 1: index nodes by ID
@@ -188,24 +615,20 @@ def parse_elements(data):
         if el.get("type") == "node" and "lat" in el and "lon" in el:
             nodes[el["id"]] = el
 
-    pois = []
-    speed_camera_count = 0
-    trajectory_count = 0
-
     # Pass 2: speed_camera nodes
     for el in elements:
         if el.get("type") == "node":
             tags = el.get("tags", {})
             if tags.get("highway") == "speed_camera":
                 name = tags.get("name", tags.get("ref", f"node/{el['id']}"))
-                pois.append({
+                yield {
                     "lat": el["lat"],
                     "lon": el["lon"],
                     "name": name,
                     "type": "speed_camera",
                     "maxspeed": normalize_maxspeed(tags.get("maxspeed")),
-                })
-                speed_camera_count += 1
+                }
+                stats["speed_cameras"] += 1
 
     # Pass 3: enforcement relations
     for el in elements:
@@ -243,36 +666,38 @@ def parse_elements(data):
             speed_label = f" {maxspeed}" if maxspeed else ""
 
             if entry_node:
-                pois.append({
+                yield {
                     "lat": entry_node["lat"],
                     "lon": entry_node["lon"],
                     "name": f"{base_name}{zone_len}",
                     "type": "trajectory_start",
                     "maxspeed": maxspeed,
+                    "trajectory_id": el["id"],
                     # Per-POI overrides
                     "icon": TRAJECTORY_ENTRY["icon"],
                     "category": f"Trajectory{speed_label} START",
                     "activity_level": TRAJECTORY_ENTRY["level"],
                     "activity_value": TRAJECTORY_ENTRY["value"],
                     "activity_unit": TRAJECTORY_ENTRY["unit"],
-                })
+                }
 
             if exit_node:
-                pois.append({
+                yield {
                     "lat": exit_node["lat"],
                     "lon": exit_node["lon"],
                     "name": f"{base_name} END",
                     "type": "trajectory_end",
                     "maxspeed": maxspeed,
+                    "trajectory_id": el["id"],
                     # Per-POI overrides
                     "icon": TRAJECTORY_EXIT["icon"],
                     "category": f"Trajectory{speed_label} END",
                     "activity_level": TRAJECTORY_EXIT["level"],
                     "activity_value": TRAJECTORY_EXIT["value"],
                     "activity_unit": TRAJECTORY_EXIT["unit"],
-                })
+                }
 
-            trajectory_count += 1
+            stats["trajectories"] += 1
         else:
             # Point enforcement (maxspeed): single POI at device or from node
             device_ref = None
@@ -286,28 +711,56 @@ def parse_elements(data):
             ref = device_ref or from_ref
             if ref and ref in nodes:
                 node = nodes[ref]
-                pois.append({
+                yield {
                     "lat": node["lat"],
                     "lon": node["lon"],
                     "name": base_name,
                     "type": "enforcement",
                     "maxspeed": maxspeed,
-                })
-                speed_camera_count += 1
+                }
+                stats["speed_cameras"] += 1
 
-    return pois, speed_camera_count, trajectory_count
 
+def iter_pois(documents, stats=None):
+    """Parse stage: yield POIs from each Overpass document in turn."""
+    for data in documents:
+        yield from iter_elements(data, stats)
 
-def deduplicate(pois):
-    """Deduplicate POIs by coordinate (6 decimal places ≈ 11cm)."""
+
+def parse_elements(data):
+    """
+    Parse Overpass JSON into a list of POI dicts.
+
+    Eager wrapper around iter_elements.
+    Returns (pois, speed_camera_count, trajectory_count).
+    """
+    stats = {}
+    pois = list(iter_elements(data, stats))
+    return pois, stats["speed_cameras"], stats["trajectories"]
+
+
+def iter_deduplicated(pois, stats=None):
+    """
+    Lazily drop POIs whose coordinate was already seen (6 decimals ≈ 11cm).
+
+    If a stats dict is given, its "duplicates" counter is incremented.
+    """
+    if stats is None:
+        stats = {}
+    stats.setdefault("duplicates", 0)
     seen = set()
-    unique = []
     for poi in pois:
         key = (round(poi["lat"], 6), round(poi["lon"], 6))
-        if key not in seen:
-            seen.add(key)
-            unique.append(poi)
-    return unique
+        if key in seen:
+            stats["duplicates"] += 1
+            continue
+        seen.add(key)
+        yield poi
+
+
+def deduplicate(pois):
+    """Deduplicate POIs by coordinate (6 decimal places ≈ 11cm)."""
+    return list(iter_deduplicated(pois))
 
 
 def xml_escape(s):
@@ -321,7 +774,20 @@ def xml_escape(s):
     )
 
 
-def write_mercedes_gpx(pois, output_path, category="Speedcamera", icon_id=6,
+GPX_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="no"?>\n'
+    '<gpx:gpx creator="" version="1.1" '
+    'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+    'xmlns:gpx="http://www.topografix.com/GPX/1/1" '
+    'xsi:schemaLocation="http://www.topografix.com/GPX/1/1 '
+    'http://www.topografix.com/GPX/1/1/gpx.xsd" '
+    'xmlns:gpxd="http://www.daimler.com/DaimlerGPXExtensions/V2.4">\n'
+)
+GPX_FOOTER = "</gpx:gpx>\n"
+
+
+def write_mercedes_gpx(pois, output_path, category=DEFAULT_CATEGORY,
+                        icon_id=DEFAULT_ICON,
                         activity_level="warning", activity_value="50",
                         activity_unit="second"):
     """
@@ -329,50 +795,45 @@ def write_mercedes_gpx(pois, output_path, category="Speedcamera", icon_id=6,
 
     Per-POI overrides: if a POI dict contains 'icon', 'category', 'activity_level',
     'activity_value', or 'activity_unit', those override the function-level defaults.
-    """
-    lines = []
-    lines.append('<?xml version="1.0" encoding="UTF-8" standalone="no"?>')
-    lines.append(
-        '<gpx:gpx creator="" version="1.1" '
-        'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
-        'xmlns:gpx="http://www.topografix.com/GPX/1/1" '
-        'xsi:schemaLocation="http://www.topografix.com/GPX/1/1 '
-        'http://www.topografix.com/GPX/1/1/gpx.xsd" '
-        'xmlns:gpxd="http://www.daimler.com/DaimlerGPXExtensions/V2.4">'
-    )
-
-    for poi in pois:
-        p_icon = poi.get("icon", icon_id)
-        p_cat = xml_escape(poi.get("category", category))
-        p_level = poi.get("activity_level", activity_level)
-        p_value = poi.get("activity_value", activity_value)
-        p_unit = poi.get("activity_unit", activity_unit)
-        name = xml_escape(poi["name"])
-
-        lines.append(f'\t<gpx:wpt lat="{poi["lat"]}" lon="{poi["lon"]}">')
-        lines.append(f'\t<gpx:name>"{name}"</gpx:name>')
-        lines.append(
-            "\t\t<gpx:extensions><gpxd:WptExtension>"
-            f'<gpxd:WptIconId IconId="{p_icon}"></gpxd:WptIconId>'
-        )
-        lines.append(f'\t\t<gpxd:POICategory Cat="{p_cat}"></gpxd:POICategory>')
-        lines.append(
-            f'\t\t<gpxd:Activity Active="true" Level="{p_level}" '
-            f'Unit="{p_unit}" Value="{p_value}"></gpxd:Activity>'
-        )
-        lines.append('\t\t<gpxd:Presentation ShowOnMap="true"></gpxd:Presentation>')
-        lines.append(
-            '\t\t<gpxd:Address ISO="BE" Country="Belgium" State="" '
-            'City="" CityCenter="" Street="" Street2="" HouseNo="" ZIP=""/>'
-        )
-        lines.append("\t</gpxd:WptExtension>")
-        lines.append("\t</gpx:extensions>")
-        lines.append("\t</gpx:wpt>")
-
-    lines.append("</gpx:gpx>")
 
+    pois may be any iterable (e.g. a pipeline generator); it is written as it
+    is consumed. Returns the number of POIs written.
+    """
+    count = 0
     with open(output_path, "w", encoding="utf-8", newline="\n") as f:
-        f.write("\n".join(lines) + "\n")
+        f.write(GPX_HEADER)
+        for poi in pois:
+            p_icon = poi.get("icon", icon_id)
+            p_cat = xml_escape(poi.get("category", category))
+            p_level = poi.get("activity_level", activity_level)
+            p_value = poi.get("activity_value", activity_value)
+            p_unit = poi.get("activity_unit", activity_unit)
+            name = xml_escape(poi["name"])
+
+            lines = []
+            lines.append(f'\t<gpx:wpt lat="{poi["lat"]}" lon="{poi["lon"]}">')
+            lines.append(f'\t<gpx:name>"{name}"</gpx:name>')
+            lines.append(
+                "\t\t<gpx:extensions><gpxd:WptExtension>"
+                f'<gpxd:WptIconId IconId="{p_icon}"></gpxd:WptIconId>'
+            )
+            lines.append(f'\t\t<gpxd:POICategory Cat="{p_cat}"></gpxd:POICategory>')
+            lines.append(
+                f'\t\t<gpxd:Activity Active="true" Level="{p_level}" '
+                f'Unit="{p_unit}" Value="{p_value}"></gpxd:Activity>'
+            )
+            lines.append('\t\t<gpxd:Presentation ShowOnMap="true"></gpxd:Presentation>')
+            lines.append(
+                '\t\t<gpxd:Address ISO="BE" Country="Belgium" State="" '
+                'City="" CityCenter="" Street="" Street2="" HouseNo="" ZIP=""/>'
+            )
+            lines.append("\t</gpxd:WptExtension>")
+            lines.append("\t</gpx:extensions>")
+            lines.append("\t</gpx:wpt>")
+            f.write("\n".join(lines) + "\n")
+            count += 1
+        f.write(GPX_FOOTER)
+    return count
 
 
 def _coords_match(a, b, tolerance=1e-7):
@@ -442,7 +903,7 @@ def parse_trajectory_routes(data):
     Extract route geometry for trajectory (average_speed) enforcement relations.
 
     Returns a list of route dicts:
-        {name, maxspeed, length_m, waypoints: [{lat, lon}, ...]}
+        {trajectory_id, name, maxspeed, length_m, waypoints: [{lat, lon}, ...]}
 
     Uses 'section' way members to get road geometry.
     """
@@ -517,6 +978,7 @@ def parse_trajectory_routes(data):
 
         speed_label = f" {maxspeed}" if maxspeed else ""
         routes.append({
+            "trajectory_id": el["id"],
             "name": f"Trajectory{speed_label}: {base_name}",
             "maxspeed": maxspeed,
             "length_m": length_m,
@@ -532,44 +994,37 @@ def write_trajectory_routes_gpx(routes, output_path):
 
     Uses <gpx:rte> elements with DaimlerGPXExtensions for route metadata.
     Place the output file in the Routes/ folder on the SD card.
+    Returns the number of routes written.
     """
-    lines = []
-    lines.append('<?xml version="1.0" encoding="UTF-8" standalone="no"?>')
-    lines.append(
-        '<gpx:gpx creator="" version="1.1" '
-        'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
-        'xmlns:gpx="http://www.topografix.com/GPX/1/1" '
-        'xsi:schemaLocation="http://www.topografix.com/GPX/1/1 '
-        'http://www.topografix.com/GPX/1/1/gpx.xsd" '
-        'xmlns:gpxd="http://www.daimler.com/DaimlerGPXExtensions/V2.4">'
-    )
-
-    for route in routes:
-        name = xml_escape(route["name"])
-        length_km = route["length_m"] / 1000.0
-
-        lines.append('\t<gpx:rte>')
-        lines.append(f'\t\t<gpx:name>{name}</gpx:name>')
-        lines.append('\t\t<gpx:extensions>')
-        lines.append('\t\t\t<gpxd:RteExtension>')
-        lines.append(
-            f'\t\t\t\t<gpxd:RouteLength Unit="kilometer" '
-            f'Value="{length_km:.2f}"/>'
-        )
-        lines.append('\t\t\t</gpxd:RteExtension>')
-        lines.append('\t\t</gpx:extensions>')
-
-        for wp in route["waypoints"]:
+    count = 0
+    with open(output_path, "w", encoding="utf-8", newline="\n") as f:
+        f.write(GPX_HEADER)
+        for route in routes:
+            name = xml_escape(route["name"])
+            length_km = route["length_m"] / 1000.0
+
+            lines = []
+            lines.append('\t<gpx:rte>')
+            lines.append(f'\t\t<gpx:name>{name}</gpx:name>')
+            lines.append('\t\t<gpx:extensions>')
+            lines.append('\t\t\t<gpxd:RteExtension>')
             lines.append(
-                f'\t\t<gpx:rtept lat="{wp["lat"]}" lon="{wp["lon"]}"/>'
+                f'\t\t\t\t<gpxd:RouteLength Unit="kilometer" '
+                f'Value="{length_km:.2f}"/>'
             )
+            lines.append('\t\t\t</gpxd:RteExtension>')
+            lines.append('\t\t</gpx:extensions>')
 
-        lines.append('\t</gpx:rte>')
-
-    lines.append('</gpx:gpx>')
+            for wp in route["waypoints"]:
+                lines.append(
+                    f'\t\t<gpx:rtept lat="{wp["lat"]}" lon="{wp["lon"]}"/>'
+                )
 
-    with open(output_path, "w", encoding="utf-8", newline="\n") as f:
-        f.write("\n".join(lines) + "\n")
+            lines.append('\t</gpx:rte>')
+            f.write("\n".join(lines) + "\n")
+            count += 1
+        f.write(GPX_FOOTER)
+    return count
 
 
 def group_by_speed(pois):
@@ -582,19 +1037,568 @@ def group_by_speed(pois):
     Returns dict: zone_key → list of POIs.
     """
     groups = {}
+    for poi in pois:
+        groups.setdefault(speed_group_key(poi), []).append(poi)
+    return groups
+
+
+def speed_group_key(poi):
+    """group_by_speed key for one POI: a SPEED_ZONES key, "other" or "trajectory"."""
+    if poi["type"].startswith("trajectory_"):
+        return "trajectory"
+    ms = poi.get("maxspeed")
+    if ms and ms in SPEED_ZONES:
+        return ms
+    return "other"
+
+
+def read_gpx_track(path):
+    """
+    Read a GPX file as a list of polylines, each a list of (lat, lon) tuples.
+
+    Every track segment (<trkseg>) is its own polyline, so gaps between
+    segments are not bridged. Without tracks, every route (<rte>) is one
+    polyline. A file with only waypoints (<wpt>) has no driving order, so
+    each waypoint becomes a single-point polyline (a circle of the corridor
+    width around it). Namespace-agnostic, so both plain GPX and
+    gpx:-prefixed files work.
+    """
+    segments = {"trkseg": [], "rte": []}
+    waypoints = []
+    current = []
+    for event, el in ET.iterparse(path, events=("start", "end")):
+        tag = el.tag.rsplit("}", 1)[-1]
+        if event == "start":
+            if tag in segments:
+                current = []
+            continue
+        if tag in ("trkpt", "rtept", "wpt") and "lat" in el.attrib and "lon" in el.attrib:
+            point = (float(el.attrib["lat"]), float(el.attrib["lon"]))
+            if tag == "wpt":
+                waypoints.append([point])
+            else:
+                current.append(point)
+        elif tag in segments and current:
+            segments[tag].append(current)
+            current = []
+        el.clear()
+    return segments["trkseg"] or segments["rte"] or waypoints
+
+
+def _segment_distance_m(lat, lon, a, b):
+    """
+    Distance in meters from a point to the segment a-b.
+
+    Uses a local equirectangular projection centred on the point, which is
+    accurate for the short (densified) segments stored in CorridorIndex.
+    """
+    kx = METERS_PER_DEG_LAT * math.cos(math.radians(lat))
+    ax = (a[1] - lon) * kx
+    ay = (a[0] - lat) * METERS_PER_DEG_LAT
+    bx = (b[1] - lon) * kx
+    by = (b[0] - lat) * METERS_PER_DEG_LAT
+    dx = bx - ax
+    dy = by - ay
+    seg_len2 = dx * dx + dy * dy
+    if seg_len2 == 0:
+        return math.hypot(ax, ay)
+    t = max(0.0, min(1.0, -(ax * dx + ay * dy) / seg_len2))
+    return math.hypot(ax + t * dx, ay + t * dy)
+
+
+class CorridorIndex:
+    """
+    Grid-bucket spatial index over a track, for "within N meters" lookups.
+
+    The track is a list of polylines (see read_gpx_track); single-point
+    polylines act as circles. Each polyline is densified into pieces no
+    longer than the corridor width and
+    each piece is registered in every grid cell its bounding box touches.
+    Cells are at least `width_m` wide everywhere on the track (the longitude
+    step is sized at the track's highest latitude), so any piece within
+    `width_m` of a point is found in the 3x3 cells around that point.
+    """
+
+    def __init__(self, polylines, width_m=DEFAULT_CORRIDOR_WIDTH):
+        if width_m <= 0:
+            raise ValueError("corridor width must be positive")
+        self.width_m = width_m
+        self.cells = {}
+        polylines = [line for line in polylines if line]
+        if not polylines:
+            return
+
+        max_abs_lat = min(max(abs(lat) for line in polylines for lat, _ in line), 89.0)
+        self.cell_lat = width_m / METERS_PER_DEG_LAT
+        self.cell_lon = width_m / (METERS_PER_DEG_LAT
+                                   * math.cos(math.radians(max_abs_lat)))
+
+        for line in polylines:
+            if len(line) == 1:
+                self._insert(line[0], line[0])
+            for i in range(1, len(line)):
+                a = line[i - 1]
+                b = line[i]
+                steps = max(1, math.ceil(haversine_m(a[0], a[1], b[0], b[1]) / width_m))
+                prev = a
+                for s in range(1, steps + 1):
+                    f = s / steps
+                    cur = (a[0] + (b[0] - a[0]) * f, a[1] + (b[1] - a[1]) * f)
+                    self._insert(prev, cur)
+                    prev = cur
+
+    def _cell(self, lat, lon):
+        return (math.floor(lat / self.cell_lat), math.floor(lon / self.cell_lon))
+
+    def _insert(self, a, b):
+        ra, ca = self._cell(*a)
+        rb, cb = self._cell(*b)
+        for r in range(min(ra, rb), max(ra, rb) + 1):
+            for c in range(min(ca, cb), max(ca, cb) + 1):
+                self.cells.setdefault((r, c), []).append((a, b))
+
+    def contains(self, lat, lon):
+        """True if (lat, lon) lies within width_m of the track."""
+        if not self.cells:
+            return False
+        row, col = self._cell(lat, lon)
+        for r in (row - 1, row, row + 1):
+            for c in (col - 1, col, col + 1):
+                for a, b in self.cells.get((r, c), ()):
+                    if _segment_distance_m(lat, lon, a, b) <= self.width_m:
+                        return True
+        return False
+
+
+def corridor_trajectory_ids(documents, index):
+    """
+    Relation IDs of trajectory zones that touch the corridor.
+
+    A zone counts when any point of its section route, or its entry or
+    exit node, lies inside. Its entry/exit POIs and its route are then
+    kept or dropped together (see iter_corridor, filter_routes_corridor),
+    so a trip never gets an entry warning without the matching exit.
+    """
+    ids = set()
+    for data in documents:
+        for route in parse_trajectory_routes(data):
+            if any(index.contains(wp["lat"], wp["lon"]) for wp in route["waypoints"]):
+                ids.add(route["trajectory_id"])
+        for poi in iter_elements(data):
+            if (poi["type"].startswith("trajectory_")
+                    and index.contains(poi["lat"], poi["lon"])):
+                ids.add(poi["trajectory_id"])
+    return ids
+
+
+def iter_corridor(pois, index, trajectories, stats=None):
+    """
+    Lazily keep only POIs within the corridor of a CorridorIndex.
+
+    Trajectory entry/exit POIs are kept when their zone is in trajectories
+    (see corridor_trajectory_ids) rather than by their own position.
+    If a stats dict is given, its "outside_corridor" counter is incremented.
+    """
+    if stats is None:
+        stats = {}
+    stats.setdefault("outside_corridor", 0)
     for poi in pois:
         if poi["type"].startswith("trajectory_"):
-            key = "trajectory"
+            inside = poi["trajectory_id"] in trajectories
         else:
-            ms = poi.get("maxspeed")
-            if ms and ms in SPEED_ZONES:
-                key = ms
-            else:
-                key = "other"
-        groups.setdefault(key, []).append(poi)
+            inside = index.contains(poi["lat"], poi["lon"])
+        if inside:
+            yield poi
+        else:
+            stats["outside_corridor"] += 1
+
+
+def filter_corridor(pois, index, trajectories):
+    """Keep only POIs within the corridor of a CorridorIndex."""
+    return list(iter_corridor(pois, index, trajectories))
+
+
+def filter_routes_corridor(routes, trajectories):
+    """Keep trajectory routes whose zone is in trajectories."""
+    return [r for r in routes if r["trajectory_id"] in trajectories]
+
+
+def iter_trajectory_routes(documents, trajectories=None):
+    """
+    Yield trajectory routes from each document.
+
+    With a set of trajectory IDs (see corridor_trajectory_ids), only those
+    zones' routes are yielded.
+    """
+    for data in documents:
+        routes = parse_trajectory_routes(data)
+        if trajectories is not None:
+            routes = filter_routes_corridor(routes, trajectories)
+        yield from routes
+
+
+def pipeline(source, *stages):
+    """
+    Chain lazy stages onto a source iterable.
+
+    Each stage is a callable taking an iterable and returning an iterable,
+    so filters can be inserted anywhere, e.g.:
+
+        pois = pipeline(
+            iter_documents(regions=["antwerp"]),
+            iter_pois,
+            iter_deduplicated,
+            lambda it: (p for p in it if p["maxspeed"] == "50"),
+        )
+        write_mercedes_gpx(pois, "antwerp_50.gpx")
+
+    Nothing runs until the result is consumed.
+    """
+    it = source
+    for stage in stages:
+        it = stage(it)
+    return it
+
+
+def iter_speedcam_pois(documents, corridor=None, stats=None, trajectories=None):
+    """
+    Standard POI pipeline: parse → dedup → optional corridor filter.
+
+    With a corridor, documents is read twice (trajectory zones are decided
+    up front), so pass a list; trajectories may be given if already computed.
+    Counters for the CLI report are collected in stats if given.
+    """
+    stages = [
+        lambda it: iter_pois(it, stats),
+        lambda it: iter_deduplicated(it, stats),
+    ]
+    if corridor is not None:
+        documents = list(documents)
+        if trajectories is None:
+            trajectories = corridor_trajectory_ids(documents, corridor)
+        stages.append(lambda it: iter_corridor(it, corridor, trajectories, stats))
+    return pipeline(documents, *stages)
+
+
+def _gpkg_geometry(coords):
+    """
+    GeoPackage geometry blob (little-endian header + WKB) for a point
+    (one (lon, lat) pair) or a linestring (several), in EPSG:4326.
+    """
+    if len(coords) == 1:
+        # Point: no envelope (flags: little-endian only)
+        header = b"GP" + struct.pack("<BBi", 0, 0b001, WGS84_SRS_ID)
+        wkb = struct.pack("<BIdd", 1, 1, coords[0][0], coords[0][1])
+        return header + wkb
+    xs = [c[0] for c in coords]
+    ys = [c[1] for c in coords]
+    # Linestring: XY envelope (flags: envelope indicator 1, little-endian)
+    header = b"GP" + struct.pack("<BBi", 0, 0b011, WGS84_SRS_ID)
+    header += struct.pack("<dddd", min(xs), max(xs), min(ys), max(ys))
+    wkb = struct.pack("<BII", 1, 2, len(coords))
+    wkb += b"".join(struct.pack("<dd", x, y) for x, y in coords)
+    return header + wkb
+
+
+_GPKG_SCHEMA = """
+CREATE TABLE gpkg_spatial_ref_sys (
+    srs_name TEXT NOT NULL, srs_id INTEGER PRIMARY KEY,
+    organization TEXT NOT NULL, organization_coordsys_id INTEGER NOT NULL,
+    definition TEXT NOT NULL, description TEXT);
+CREATE TABLE gpkg_contents (
+    table_name TEXT NOT NULL PRIMARY KEY, data_type TEXT NOT NULL,
+    identifier TEXT UNIQUE, description TEXT DEFAULT '',
+    last_change DATETIME NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ','now')),
+    min_x DOUBLE, min_y DOUBLE, max_x DOUBLE, max_y DOUBLE,
+    srs_id INTEGER REFERENCES gpkg_spatial_ref_sys(srs_id));
+CREATE TABLE gpkg_geometry_columns (
+    table_name TEXT NOT NULL, column_name TEXT NOT NULL,
+    geometry_type_name TEXT NOT NULL, srs_id INTEGER NOT NULL,
+    z TINYINT NOT NULL, m TINYINT NOT NULL,
+    CONSTRAINT pk_geom_cols PRIMARY KEY (table_name, column_name));
+CREATE TABLE gpkg_extensions (
+    table_name TEXT, column_name TEXT, extension_name TEXT NOT NULL,
+    definition TEXT NOT NULL, scope TEXT NOT NULL,
+    CONSTRAINT ge_tce UNIQUE (table_name, column_name, extension_name));
+CREATE TABLE pois (
+    fid INTEGER PRIMARY KEY AUTOINCREMENT, geom POINT,
+    name TEXT, type TEXT, maxspeed INTEGER, category TEXT, icon INTEGER,
+    lat REAL, lon REAL);
+CREATE TABLE routes (
+    fid INTEGER PRIMARY KEY AUTOINCREMENT, geom LINESTRING,
+    name TEXT, maxspeed INTEGER, length_m REAL, points INTEGER);
+CREATE VIRTUAL TABLE rtree_pois_geom USING rtree(id, minx, maxx, miny, maxy);
+CREATE VIRTUAL TABLE rtree_routes_geom USING rtree(id, minx, maxx, miny, maxy);
+"""
+
+_GPKG_SRS_ROWS = [
+    ("Undefined cartesian SRS", -1, "NONE", -1, "undefined", None),
+    ("Undefined geographic SRS", 0, "NONE", 0, "undefined", None),
+    ("WGS 84 geodetic", WGS84_SRS_ID, "EPSG", 4326,
+     'GEOGCS["WGS 84",DATUM["WGS_1984",SPHEROID["WGS 84",6378137,298.257223563,'
+     'AUTHORITY["EPSG","7030"]],AUTHORITY["EPSG","6326"]],PRIMEM["Greenwich",0,'
+     'AUTHORITY["EPSG","8901"]],UNIT["degree",0.0174532925199433,'
+     'AUTHORITY["EPSG","9122"]],AUTHORITY["EPSG","4326"]]',
+     "longitude/latitude coordinates in decimal degrees on the WGS 84 spheroid"),
+]
+
+
+def _maxspeed_int(maxspeed):
+    return int(maxspeed) if maxspeed else None
+
+
+def write_geopackage(pois, routes, output_path, by_speed=False):
+    """
+    Sink: write POIs and trajectory routes to a GeoPackage (SQLite) file.
+
+    Tables "pois" (points) and "routes" (linestrings) carry name, type,
+    maxspeed etc. next to the geometry, with indexes on maxspeed and type
+    and an R-tree (rtree_<table>_geom) for bounding-box queries, e.g.:
+
+        SELECT p.* FROM pois p JOIN rtree_pois_geom r ON p.fid = r.id
+        WHERE r.minx <= 4.5 AND r.maxx >= 4.3
+          AND r.miny <= 51.3 AND r.maxy >= 51.1 AND p.maxspeed = 50;
+
+    category and icon hold what the GPX output uses for each POI: its own
+    override (trajectory POIs), else the speed zone style when by_speed
+    (--split), else the single-file defaults.
+
+    The file is written once in a single transaction, so the R-trees are
+    filled directly rather than through the spec's maintenance triggers.
+    An existing file at output_path is replaced.
+    Returns (poi_count, route_count).
+    """
+    if os.path.exists(output_path):
+        os.remove(output_path)
+
+    conn = sqlite3.connect(output_path)
+    try:
+        conn.execute(f"PRAGMA application_id = {GPKG_APPLICATION_ID}")
+        conn.execute(f"PRAGMA user_version = {GPKG_USER_VERSION}")
+        with conn:
+            conn.executescript("BEGIN;" + _GPKG_SCHEMA)
+            conn.executemany(
+                "INSERT INTO gpkg_spatial_ref_sys VALUES (?, ?, ?, ?, ?, ?)",
+                _GPKG_SRS_ROWS,
+            )
+
+            poi_rows = []
+            for p in pois:
+                style = _zone_style(speed_group_key(p)) if by_speed else {}
+                poi_rows.append((
+                    _gpkg_geometry([(p["lon"], p["lat"])]),
+                    p["name"], p["type"], _maxspeed_int(p.get("maxspeed")),
+                    p.get("category", style.get("category", DEFAULT_CATEGORY)),
+                    p.get("icon", style.get("icon_id", DEFAULT_ICON)),
+                    p["lat"], p["lon"],
+                ))
+            conn.executemany(
+                "INSERT INTO pois (geom, name, type, maxspeed, category, icon, "
+                "lat, lon) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                poi_rows,
+            )
+            conn.execute(
+                "INSERT INTO rtree_pois_geom "
+                "SELECT fid, lon, lon, lat, lat FROM pois"
+            )
+
+            route_rows = []
+            route_boxes = []
+            for fid, r in enumerate(routes, 1):
+                coords = [(wp["lon"], wp["lat"]) for wp in r["waypoints"]]
+                if len(coords) == 1:
+                    coords = coords * 2  # degenerate: keep it a linestring
+                xs = [c[0] for c in coords]
+                ys = [c[1] for c in coords]
+                route_rows.append((
+                    fid, _gpkg_geometry(coords), r["name"],
+                    _maxspeed_int(r.get("maxspeed")), r["length_m"],
+                    len(r["waypoints"]),
+                ))
+                route_boxes.append((fid, min(xs), max(xs), min(ys), max(ys)))
+            conn.executemany(
+                "INSERT INTO routes (fid, geom, name, maxspeed, length_m, points) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                route_rows,
+            )
+            conn.executemany(
+                "INSERT INTO rtree_routes_geom VALUES (?, ?, ?, ?, ?)",
+                route_boxes,
+            )
+
+            conn.execute("CREATE INDEX pois_maxspeed ON pois (maxspeed)")
+            conn.execute("CREATE INDEX pois_type ON pois (type)")
+            conn.execute("CREATE INDEX routes_maxspeed ON routes (maxspeed)")
+
+            for table, geom_type, rtree in (("pois", "POINT", "rtree_pois_geom"),
+                                            ("routes", "LINESTRING",
+                                             "rtree_routes_geom")):
+                bbox = conn.execute(
+                    f"SELECT min(minx), min(miny), max(maxx), max(maxy) FROM {rtree}"
+                ).fetchone()
+                conn.execute(
+                    "INSERT INTO gpkg_contents (table_name, data_type, identifier, "
+                    "min_x, min_y, max_x, max_y, srs_id) "
+                    "VALUES (?, 'features', ?, ?, ?, ?, ?, ?)",
+                    (table, table) + tuple(bbox) + (WGS84_SRS_ID,),
+                )
+                conn.execute(
+                    "INSERT INTO gpkg_geometry_columns VALUES (?, 'geom', ?, ?, 0, 0)",
+                    (table, geom_type, WGS84_SRS_ID),
+                )
+                conn.execute(
+                    "INSERT INTO gpkg_extensions VALUES (?, 'geom', "
+                    "'gpkg_rtree_index', 'http://www.geopackage.org/spec120/#extension_rtree', "
+                    "'write-only')",
+                    (table,),
+                )
+    finally:
+        conn.close()
+
+    return len(poi_rows), len(route_rows)
+
+
+def _zone_style(group_key):
+    """write_mercedes_gpx keyword arguments for a group_by_speed key."""
+    if group_key == "trajectory":
+        # Entry + exit POIs carry their own overrides
+        return {}
+    zone = SPEED_ZONES.get(group_key, DEFAULT_ZONE)
+    return {
+        "category": zone["category"],
+        "icon_id": zone["icon"],
+        "activity_value": zone["value"],
+        "activity_unit": zone["unit"],
+    }
+
+
+def _ordered_speed_groups(groups):
+    """Yield (key, pois) from group_by_speed: zones ascending, other, trajectory."""
+    for zone_key in sorted(SPEED_ZONES.keys(), key=int):
+        if zone_key in groups:
+            yield zone_key, groups[zone_key]
+    for key in ("other", "trajectory"):
+        if key in groups:
+            yield key, groups[key]
+
+
+def write_split_by_speed(pois, output_path):
+    """
+    Sink: write one GPX file per speed zone, plus _other and _trajectory.
+
+    File names derive from output_path (speedcams.gpx → speedcams_50.gpx).
+    Returns a list of (group_key, filename, pois) for each file written,
+    speed zones first in ascending order.
+    """
+    out_dir = os.path.dirname(output_path) or "."
+    base = os.path.splitext(os.path.basename(output_path))[0]
+    written = []
+    for key, group in _ordered_speed_groups(group_by_speed(pois)):
+        filename = f"{base}_{key}.gpx"
+        write_mercedes_gpx(group, os.path.join(out_dir, filename), **_zone_style(key))
+        written.append((key, filename, group))
+    return written
+
+
+def hilbert_index(lat, lon, order=HILBERT_ORDER):
+    """
+    Position of (lat, lon) along a Hilbert curve over the whole globe.
+
+    The world is mapped onto a 2^order × 2^order grid; nearby points get
+    nearby indexes, so sorting by this keeps waypoints spatially local.
+    """
+    n = 1 << order
+    x = min(n - 1, int((lon + 180.0) / 360.0 * n))
+    y = min(n - 1, int((lat + 90.0) / 180.0 * n))
+    d = 0
+    s = n >> 1
+    while s > 0:
+        rx = 1 if x & s else 0
+        ry = 1 if y & s else 0
+        d += s * s * ((3 * rx) ^ ry)
+        # Rotate quadrant so the sub-curve has the right orientation
+        if ry == 0:
+            if rx == 1:
+                x = s - 1 - (x & (s - 1))
+                y = s - 1 - (y & (s - 1))
+            x, y = y, x
+        s >>= 1
+    return d
+
+
+def sort_hilbert(pois):
+    """Return POIs sorted along the Hilbert curve (ties broken deterministically)."""
+    return sorted(pois, key=lambda p: (hilbert_index(p["lat"], p["lon"]),
+                                       p["lat"], p["lon"], p["name"]))
+
+
+def tile_name(lat, lon, tile_deg):
+    """Name of the tile containing (lat, lon), from its south-west corner: N51E4."""
+    # Epsilon: 4.3 / 0.1 == 42.999…, but 4.3 lies on the E4.3 tile's edge
+    lat0 = round(math.floor(lat / tile_deg + TILE_EPSILON) * tile_deg, 6)
+    lon0 = round(math.floor(lon / tile_deg + TILE_EPSILON) * tile_deg, 6)
+    ns = "N" if lat0 >= 0 else "S"
+    ew = "E" if lon0 >= 0 else "W"
+    return f"{ns}{abs(lat0):g}{ew}{abs(lon0):g}"
+
+
+def group_by_tile(pois, tile_deg):
+    """
+    Group POIs into tile_deg × tile_deg geographic tiles.
+
+    Returns dict: tile name → list of POIs.
+    """
+    groups = {}
+    for poi in pois:
+        groups.setdefault(tile_name(poi["lat"], poi["lon"], tile_deg), []).append(poi)
     return groups
 
 
+def write_split_by_tile(pois, output_path, tile_deg, max_per_file=None,
+                        by_speed=False):
+    """
+    Sink: write one GPX file per geographic tile (speedcams_N51E4.gpx).
+
+    Waypoints in every file are Hilbert-ordered. A tile with more than
+    max_per_file POIs is cut into consecutive runs of the Hilbert order
+    (speedcams_N51E4_1.gpx, _2, ...), which keeps each part compact.
+    With by_speed, every tile is further split like --split
+    (speedcams_N51E4_50.gpx, speedcams_N51E4_trajectory.gpx, ...).
+
+    Returns a list of (group_key, filename, pois) for each file written;
+    group_key is the group_by_speed key, or None without by_speed.
+    Tiles are written in Hilbert order of their contents.
+    """
+    out_dir = os.path.dirname(output_path) or "."
+    base = os.path.splitext(os.path.basename(output_path))[0]
+    tiles = {name: sort_hilbert(group)
+             for name, group in group_by_tile(pois, tile_deg).items()}
+    written = []
+
+    for name in sorted(tiles, key=lambda t: (hilbert_index(tiles[t][0]["lat"],
+                                                           tiles[t][0]["lon"]), t)):
+        if by_speed:
+            # group_by_speed keeps input order, so groups stay Hilbert-sorted
+            groups = list(_ordered_speed_groups(group_by_speed(tiles[name])))
+        else:
+            groups = [(None, tiles[name])]
+
+        for key, group in groups:
+            stem = f"{base}_{name}" if key is None else f"{base}_{name}_{key}"
+            style = {} if key is None else _zone_style(key)
+            if max_per_file and len(group) > max_per_file:
+                parts = [group[i:i + max_per_file]
+                         for i in range(0, len(group), max_per_file)]
+            else:
+                parts = [group]
+            for i, part in enumerate(parts, 1):
+                filename = f"{stem}_{i}.gpx" if len(parts) > 1 else f"{stem}.gpx"
+                write_mercedes_gpx(part, os.path.join(out_dir, filename), **style)
+                written.append((key, filename, part))
+
+    return written
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Fetch speed cameras from OpenStreetMap and output "
@@ -623,29 +1627,122 @@ def main():
         help="Split output into separate files per speed limit zone "
         "(speedcams_30.gpx, speedcams_50.gpx, etc.)",
     )
+    parser.add_argument(
+        "--tiles",
+        type=float,
+        metavar="DEG",
+        help="Split output into DEG x DEG degree geographic tiles "
+        "(speedcams_N51E4.gpx, ...) with Hilbert-ordered waypoints; "
+        "combine with --split to also split each tile by speed limit",
+    )
+    parser.add_argument(
+        "--tile-max",
+        type=int,
+        metavar="N",
+        help="With --tiles: cap each file at N POIs, cutting larger tiles "
+        "into Hilbert-ordered parts",
+    )
+    parser.add_argument(
+        "--gpkg",
+        metavar="FILE",
+        help="Also write POIs and trajectory routes to a GeoPackage (SQLite) "
+        "file with R-tree spatial index",
+    )
     parser.add_argument(
         "--no-routes",
         action="store_true",
         help="Skip generating trajectory route overlay file",
     )
+    parser.add_argument(
+        "--mirror",
+        action="append",
+        metavar="URL",
+        help="Overpass API endpoint to use; repeat for failover order "
+        "(default: built-in mirror list)",
+    )
+    parser.add_argument(
+        "--hedge",
+        type=float,
+        metavar="SECONDS",
+        help="Start a request on the next mirror if the current one has not "
+        "answered within SECONDS",
+    )
+    parser.add_argument(
+        "--corridor",
+        metavar="TRACK",
+        help="GPX track file; keep only POIs and trajectory routes near it",
+    )
+    parser.add_argument(
+        "--corridor-width",
+        type=float,
+        default=DEFAULT_CORRIDOR_WIDTH,
+        metavar="METERS",
+        help=f"Corridor half-width in meters for --corridor "
+        f"(default: {DEFAULT_CORRIDOR_WIDTH})",
+    )
     args = parser.parse_args()
 
-    # Fetch or load data
-    if args.input:
-        print(f"Reading local file: {args.input}", file=sys.stderr)
-        with open(args.input, "r", encoding="utf-8") as f:
-            data = json.load(f)
-    else:
-        query = build_query(args.region)
-        data = fetch_overpass(query)
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr)
 
-    # Parse
-    pois, speed_count, trajectory_count = parse_elements(data)
-    total_before = len(pois)
+    try:
+        transport = OverpassTransport(mirrors=args.mirror, hedge_after=args.hedge)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
 
-    # Deduplicate
-    pois = deduplicate(pois)
-    dupes = total_before - len(pois)
+    if args.tiles is not None and args.tiles <= 0:
+        print("Error: --tiles must be positive", file=sys.stderr)
+        sys.exit(1)
+    if args.tile_max is not None and args.tile_max <= 0:
+        print("Error: --tile-max must be positive", file=sys.stderr)
+        sys.exit(1)
+    if args.tile_max is not None and args.tiles is None:
+        print("Error: --tile-max requires --tiles", file=sys.stderr)
+        sys.exit(1)
+
+    # Route corridor
+    corridor = None
+    if args.corridor:
+        if args.corridor_width <= 0:
+            print("Error: --corridor-width must be positive", file=sys.stderr)
+            sys.exit(1)
+        track = read_gpx_track(args.corridor)
+        if not track:
+            print(f"Error: No track points found in {args.corridor}", file=sys.stderr)
+            sys.exit(1)
+        corridor = CorridorIndex(track, args.corridor_width)
+
+    # Fetch or load data (kept: POIs and routes both read the documents)
+    try:
+        if args.input:
+            documents = list(iter_documents(input_paths=[args.input]))
+        else:
+            documents = list(iter_documents([args.region], transport=transport))
+    except OverpassError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        if e.status == 429:
+            print("Rate limited. Wait a moment and try again.", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        transport.close()
+
+    # Parse → dedup → corridor (trajectory zones are kept or dropped whole)
+    trajectories = None
+    if corridor is not None:
+        trajectories = corridor_trajectory_ids(documents, corridor)
+    stats = {}
+    pois = list(iter_speedcam_pois(documents, corridor, stats, trajectories))
+    speed_count = stats["speed_cameras"]
+    trajectory_count = stats["trajectories"]
+
+    if corridor is not None:
+        before_corridor = len(pois) + stats["outside_corridor"]
+        print(
+            f"Corridor filter:     {len(pois)} of {before_corridor} POIs within "
+            f"{args.corridor_width:g} m of {sum(len(line) for line in track)} "
+            f"track points in {len(track)} segment(s)",
+            file=sys.stderr,
+        )
 
     # Count trajectory POIs after dedup
     traj_start = sum(1 for p in pois if p["type"] == "trajectory_start")
@@ -655,7 +1752,7 @@ def main():
     print(f"Speed cameras:       {speed_count}", file=sys.stderr)
     print(f"Trajectory zones:    {trajectory_count} ({traj_start} entry + {traj_end} exit POIs)",
           file=sys.stderr)
-    print(f"Duplicates removed:  {dupes}", file=sys.stderr)
+    print(f"Duplicates removed:  {stats['duplicates']}", file=sys.stderr)
     print(f"Total POIs:          {len(pois)}", file=sys.stderr)
 
     if len(pois) > COMAND_POI_LIMIT:
@@ -664,72 +1761,31 @@ def main():
             file=sys.stderr,
         )
 
-    if args.split:
-        # Split mode: one file per speed zone + trajectory file
-        groups = group_by_speed(pois)
-
-        out_dir = os.path.dirname(args.output) or "."
-        base = os.path.splitext(os.path.basename(args.output))[0]
-
+    if args.tiles or args.split:
+        # Split modes: one file per tile and/or speed zone + trajectory file
         print("", file=sys.stderr)
-        print("--- Split by speed limit ---", file=sys.stderr)
+        if args.tiles:
+            print(f"--- Split by {args.tiles:g}° tile ---", file=sys.stderr)
+            written = write_split_by_tile(pois, args.output, args.tiles,
+                                          args.tile_max, by_speed=args.split)
+        else:
+            print("--- Split by speed limit ---", file=sys.stderr)
+            written = write_split_by_speed(pois, args.output)
         total_written = 0
 
-        # Write known speed zones in order
-        for zone_key in sorted(SPEED_ZONES.keys(), key=int):
-            if zone_key not in groups:
-                continue
-            zone = SPEED_ZONES[zone_key]
-            zone_pois = groups[zone_key]
-            filename = f"{base}_{zone_key}.gpx"
-            filepath = os.path.join(out_dir, filename)
-            write_mercedes_gpx(
-                zone_pois, filepath,
-                category=zone["category"],
-                icon_id=zone["icon"],
-                activity_value=zone["value"],
-                activity_unit=zone["unit"],
-            )
-            total_written += len(zone_pois)
-            print(
-                f"  {filename:30s} {len(zone_pois):5d} POIs  "
-                f"(icon={zone['icon']}, warn={zone['value']}s)",
-                file=sys.stderr,
-            )
-
-        # Write "other" bucket (unknown/unusual maxspeed)
-        if "other" in groups:
-            other_pois = groups["other"]
-            filename = f"{base}_other.gpx"
-            filepath = os.path.join(out_dir, filename)
-            write_mercedes_gpx(
-                other_pois, filepath,
-                category=DEFAULT_ZONE["category"],
-                icon_id=DEFAULT_ZONE["icon"],
-                activity_value=DEFAULT_ZONE["value"],
-                activity_unit=DEFAULT_ZONE["unit"],
-            )
-            total_written += len(other_pois)
-            print(
-                f"  {filename:30s} {len(other_pois):5d} POIs  "
-                f"(icon={DEFAULT_ZONE['icon']}, warn={DEFAULT_ZONE['value']}s)",
-                file=sys.stderr,
-            )
-
-        # Write trajectory file (entry + exit POIs carry their own overrides)
-        if "trajectory" in groups:
-            traj_pois = groups["trajectory"]
-            filename = f"{base}_trajectory.gpx"
-            filepath = os.path.join(out_dir, filename)
-            write_mercedes_gpx(traj_pois, filepath)
-            total_written += len(traj_pois)
-            starts = sum(1 for p in traj_pois if p["type"] == "trajectory_start")
-            ends = sum(1 for p in traj_pois if p["type"] == "trajectory_end")
-            print(
-                f"  {filename:30s} {len(traj_pois):5d} POIs  "
-                f"({starts} entry + {ends} exit)",
-                file=sys.stderr,
-            )
+        for key, filename, group in written:
+            total_written += len(group)
+            if key is None:
+                detail = ""
+            elif key == "trajectory":
+                starts = sum(1 for p in group if p["type"] == "trajectory_start")
+                ends = sum(1 for p in group if p["type"] == "trajectory_end")
+                detail = f"({starts} entry + {ends} exit)"
+            else:
+                zone = SPEED_ZONES.get(key, DEFAULT_ZONE)
+                detail = f"(icon={zone['icon']}, warn={zone['value']}s)"
+            print(f"  {filename:30s} {len(group):5d} POIs  {detail}".rstrip(),
+                  file=sys.stderr)
 
         print(f"  {'':30s} -----", file=sys.stderr)
         print(f"  {'Total':30s} {total_written:5d} POIs", file=sys.stderr)
@@ -746,9 +1802,11 @@ def main():
         print(f"Written to: {args.output}", file=sys.stderr)
 
     # Route generation for trajectory zones
-    if not args.no_routes and trajectory_count > 0:
-        routes = parse_trajectory_routes(data)
-        if routes:
+    # --no-routes only skips the GPX overlay; the GeoPackage always gets routes
+    routes = []
+    if (not args.no_routes or args.gpkg) and trajectory_count > 0:
+        routes = list(iter_trajectory_routes(documents, trajectories))
+        if routes and not args.no_routes:
             out_dir = os.path.dirname(args.output) or "."
             base = os.path.splitext(os.path.basename(args.output))[0]
             route_filename = f"{base}_routes.gpx"
@@ -780,6 +1838,17 @@ def main():
                 file=sys.stderr,
             )
 
+    # GeoPackage export for downstream tools
+    if args.gpkg:
+        poi_count, route_count = write_geopackage(pois, routes, args.gpkg,
+                                                   by_speed=args.split)
+        print("", file=sys.stderr)
+        print(
+            f"GeoPackage:          {args.gpkg} "
+            f"({poi_count} POIs, {route_count} routes)",
+            file=sys.stderr,
+        )
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+"""
+overpass_standin.py — Local Overpass API stand-in and load-test harness
+for the mercedespoi.py fetch path. Uses only Python standard library.
+
+The stand-in answers POST /api/interpreter with recorded or synthetic
+Overpass JSON and can inject latency, throttling, 429/504 responses,
+truncated bodies and slow streaming. The harness drives the full CLI
+against it under concurrent load and reports throughput and latency
+percentiles.
+
+Usage:
+    # Serve synthetic data with 5% 429s and 200 ms latency
+    ./overpass_standin.py serve --synthetic 2000 --fail-429 0.05 --latency 200
+
+    # Replay a saved response; record-dir files override it per query
+    ./overpass_standin.py serve --response saved_response.json --record-dir rec/
+
+    # 50 CLI runs, 8 at a time, against an in-process stand-in
+    ./overpass_standin.py load --runs 50 --concurrency 8 --fail-504 0.1
+
+    # Same, against an already running stand-in, extra CLI args after --
+    ./overpass_standin.py load --url http://127.0.0.1:8088/api/interpreter \\
+        --runs 20 -- --split
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import math
+import os
+import random
+import socketserver
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+MERCEDESPOI = os.path.join(SCRIPT_DIR, "mercedespoi.py")
+
+DEFAULT_SYNTHETIC = 1000
+
+
+def query_key(query):
+    """Stable file name stem for a query, used by --record-dir."""
+    return hashlib.sha256(query.strip().encode("utf-8")).hexdigest()[:16]
+
+
+def synthetic_response(count, seed=0):
+    """
+    Build an Overpass-style JSON document with `count` speed cameras
+    spread over Belgium, plus one trajectory relation with a section way.
+    """
+    rng = random.Random(seed)
+    elements = []
+    for i in range(1, count + 1):
+        elements.append({
+            "type": "node",
+            "id": i,
+            "lat": round(rng.uniform(49.5, 51.5), 7),
+            "lon": round(rng.uniform(2.5, 6.4), 7),
+            "tags": {
+                "highway": "speed_camera",
+                "maxspeed": rng.choice(["30", "50", "70", "90", "120", "signals"]),
+            },
+        })
+    base = count + 1
+    elements += [
+        {"type": "node", "id": base, "lat": 51.1483, "lon": 4.9963},
+        {"type": "node", "id": base + 1, "lat": 51.1620, "lon": 5.0210},
+        {"type": "way", "id": base, "nodes": [base, base + 1]},
+        {
+            "type": "relation",
+            "id": base,
+            "tags": {"type": "enforcement", "enforcement": "average_speed",
+                     "maxspeed": "70", "name": "Synthetic trajectory"},
+            "members": [
+                {"type": "node", "ref": base, "role": "from"},
+                {"type": "node", "ref": base + 1, "role": "to"},
+                {"type": "way", "ref": base, "role": "section"},
+            ],
+        },
+    ]
+    return {"version": 0.6, "generator": "overpass_standin", "elements": elements}
+
+
+class StandinConfig:
+    """Response source and fault injection settings for the stand-in."""
+
+    def __init__(self, response=None, record_dir=None, synthetic=DEFAULT_SYNTHETIC,
+                 latency_ms=0, jitter_ms=0, rate_limit=None, fail_429=0.0,
+                 fail_504=0.0, truncate=0.0, stream_bps=None, seed=0):
+        self.response = response
+        self.record_dir = record_dir
+        self.synthetic = synthetic
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_limit = rate_limit
+        self.fail_429 = fail_429
+        self.fail_504 = fail_504
+        self.truncate = truncate
+        self.stream_bps = stream_bps
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.window = []
+        self.counts = {}
+        self._default_body = None
+
+    def roll(self, probability):
+        with self.lock:
+            return self.rng.random() < probability
+
+    def count(self, outcome):
+        with self.lock:
+            self.counts[outcome] = self.counts.get(outcome, 0) + 1
+
+    def throttled(self):
+        """Sliding one-second window request limiter for --rate-limit."""
+        if not self.rate_limit:
+            return False
+        now = time.monotonic()
+        with self.lock:
+            self.window = [t for t in self.window if now - t < 1.0]
+            if len(self.window) >= self.rate_limit:
+                return True
+            self.window.append(now)
+            return False
+
+    def body_for(self, query):
+        """Raw JSON bytes for a query: recorded file, --response, or synthetic."""
+        if self.record_dir:
+            path = os.path.join(self.record_dir, query_key(query) + ".json")
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    return f.read()
+        if self._default_body is None:
+            if self.response:
+                with open(self.response, "rb") as f:
+                    self._default_body = f.read()
+            else:
+                self._default_body = json.dumps(
+                    synthetic_response(self.synthetic)).encode("utf-8")
+        return self._default_body
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    """Overpass interpreter endpoint with injected faults."""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "overpass-standin/1.0"
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose:
+            sys.stderr.write("%s - %s\n" % (self.address_string(), fmt % args))
+
+    def _send_empty(self, status, headers=()):
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        cfg = self.server.config
+        length = int(self.headers.get("Content-Length") or 0)
+        form = urllib.parse.parse_qs(self.rfile.read(length).decode("utf-8"))
+        query = form.get("data", [""])[0]
+
+        if cfg.latency_ms or cfg.jitter_ms:
+            with cfg.lock:
+                jitter = cfg.rng.uniform(0, cfg.jitter_ms)
+            time.sleep((cfg.latency_ms + jitter) / 1000.0)
+
+        if cfg.throttled():
+            cfg.count("throttled")
+            self._send_empty(429, [("Retry-After", "1")])
+            return
+        if cfg.roll(cfg.fail_429):
+            cfg.count("429")
+            self._send_empty(429, [("Retry-After", "1")])
+            return
+        if cfg.roll(cfg.fail_504):
+            cfg.count("504")
+            self._send_empty(504)
+            return
+
+        body = cfg.body_for(query)
+        gzipped = "gzip" in (self.headers.get("Accept-Encoding") or "")
+        if gzipped:
+            body = gzip.compress(body, compresslevel=5)
+        truncated = cfg.roll(cfg.truncate)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        if gzipped:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+
+        if truncated:
+            # Promise the full length, send half, then drop the connection
+            cfg.count("truncated")
+            self.wfile.write(body[:len(body) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+
+        if cfg.stream_bps:
+            chunk = max(1, cfg.stream_bps // 10)
+            for i in range(0, len(body), chunk):
+                self.wfile.write(body[i:i + chunk])
+                self.wfile.flush()
+                time.sleep(0.1)
+        else:
+            self.wfile.write(body)
+        cfg.count("ok")
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    # http.server.ThreadingHTTPServer is 3.7+
+    daemon_threads = True
+
+
+def make_server(config, host="127.0.0.1", port=0, verbose=False):
+    """Create (not start) a stand-in server; port 0 picks a free port."""
+    server = _ThreadingHTTPServer((host, port), StandinHandler)
+    server.config = config
+    server.verbose = verbose
+    return server
+
+
+def server_url(server):
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}/api/interpreter"
+
+
+def start_background(config, **kwargs):
+    """Start a stand-in server in a daemon thread; return (server, url)."""
+    server = make_server(config, **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, server_url(server)
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def run_cli(url, out_dir, index, extra_args):
+    """Run one mercedespoi.py invocation against url; return (ok, seconds)."""
+    output = os.path.join(out_dir, f"run{index}.gpx")
+    cmd = [sys.executable, MERCEDESPOI, "--mirror", url, "-o", output] + extra_args
+    t0 = time.monotonic()
+    proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    elapsed = time.monotonic() - t0
+    if proc.returncode != 0:
+        last = proc.stderr.decode("utf-8", "replace").strip().splitlines()[-1:]
+        print(f"  run {index} failed: {last[0] if last else proc.returncode}",
+              file=sys.stderr)
+    return proc.returncode == 0, elapsed
+
+
+def load_test(url, runs, concurrency, extra_args):
+    """
+    Drive the CLI `runs` times, `concurrency` at a time.
+
+    Returns dict with ok/failed counts, wall time, throughput and
+    p50/p90/p99/max latency in seconds (successful runs only).
+    """
+    with tempfile.TemporaryDirectory(prefix="overpass_standin_") as out_dir:
+        t0 = time.monotonic()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(
+                lambda i: run_cli(url, out_dir, i, extra_args), range(runs)))
+        wall = time.monotonic() - t0
+
+    latencies = sorted(t for ok, t in results if ok)
+    return {
+        "ok": len(latencies),
+        "failed": runs - len(latencies),
+        "wall_s": wall,
+        "runs_per_s": runs / wall if wall else 0.0,
+        "p50_s": percentile(latencies, 50),
+        "p90_s": percentile(latencies, 90),
+        "p99_s": percentile(latencies, 99),
+        "max_s": latencies[-1] if latencies else 0.0,
+    }
+
+
+def _add_fault_args(parser):
+    parser.add_argument("--response", metavar="FILE",
+                        help="Overpass JSON file served for every query")
+    parser.add_argument("--record-dir", metavar="DIR",
+                        help="Per-query responses: DIR/<query hash>.json "
+                        "(see query_key) take precedence over --response")
+    parser.add_argument("--synthetic", type=int, default=DEFAULT_SYNTHETIC,
+                        metavar="N",
+                        help="Number of synthetic cameras when no --response "
+                        f"(default: {DEFAULT_SYNTHETIC})")
+    parser.add_argument("--latency", type=float, default=0, metavar="MS",
+                        help="Fixed delay before answering, in milliseconds")
+    parser.add_argument("--jitter", type=float, default=0, metavar="MS",
+                        help="Extra uniform random delay up to MS milliseconds")
+    parser.add_argument("--rate-limit", type=int, metavar="N",
+                        help="Answer 429 above N requests per second")
+    parser.add_argument("--fail-429", type=float, default=0.0, metavar="P",
+                        help="Probability of a 429 Too Many Requests response")
+    parser.add_argument("--fail-504", type=float, default=0.0, metavar="P",
+                        help="Probability of a 504 Gateway Timeout response")
+    parser.add_argument("--truncate", type=float, default=0.0, metavar="P",
+                        help="Probability of cutting the body off halfway")
+    parser.add_argument("--stream-bps", type=int, metavar="BYTES",
+                        help="Stream bodies slowly at BYTES per second")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="Random seed for fault injection (default: 0)")
+
+
+def _config_from_args(args):
+    return StandinConfig(
+        response=args.response,
+        record_dir=args.record_dir,
+        synthetic=args.synthetic,
+        latency_ms=args.latency,
+        jitter_ms=args.jitter,
+        rate_limit=args.rate_limit,
+        fail_429=args.fail_429,
+        fail_504=args.fail_504,
+        truncate=args.truncate,
+        stream_bps=args.stream_bps,
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Local Overpass API stand-in and load-test harness "
+        "for mercedespoi.py."
+    )
+    # add_subparsers(required=True) is 3.7+; checked after parsing instead
+    sub = parser.add_subparsers(dest="command")
+
+    serve = sub.add_parser("serve", help="Run the stand-in server")
+    serve.add_argument("--host", default="127.0.0.1",
+                       help="Bind address (default: 127.0.0.1)")
+    serve.add_argument("--port", type=int, default=8088,
+                       help="Port (default: 8088)")
+    serve.add_argument("-v", "--verbose", action="store_true",
+                       help="Log every request")
+    _add_fault_args(serve)
+
+    load = sub.add_parser("load", help="Drive the CLI under concurrent load")
+    load.add_argument("--url", help="Use a running stand-in instead of "
+                      "starting one in-process")
+    load.add_argument("--runs", type=int, default=20,
+                      help="Number of CLI invocations (default: 20)")
+    load.add_argument("--concurrency", type=int, default=4,
+                      help="Concurrent invocations (default: 4)")
+    load.add_argument("cli_args", nargs=argparse.REMAINDER,
+                      help="Extra mercedespoi.py arguments, after --")
+    _add_fault_args(load)
+
+    args = parser.parse_args()
+    if args.command is None:
+        parser.error("a command is required (serve or load)")
+
+    if args.command == "serve":
+        server = make_server(_config_from_args(args), args.host, args.port,
+                             args.verbose)
+        print(f"Overpass stand-in listening on {server_url(server)}",
+              file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        return
+
+    extra = [a for a in args.cli_args if a != "--"]
+    server = None
+    url = args.url
+    if not url:
+        config = _config_from_args(args)
+        server, url = start_background(config)
+
+    print(f"Load test: {args.runs} runs, concurrency {args.concurrency}, {url}",
+          file=sys.stderr)
+    stats = load_test(url, args.runs, args.concurrency, extra)
+
+    print(f"Runs:          {stats['ok']} ok, {stats['failed']} failed",
+          file=sys.stderr)
+    print(f"Wall time:     {stats['wall_s']:.2f} s", file=sys.stderr)
+    print(f"Throughput:    {stats['runs_per_s']:.2f} runs/s", file=sys.stderr)
+    print(f"Latency p50:   {stats['p50_s'] * 1000:.0f} ms", file=sys.stderr)
+    print(f"Latency p90:   {stats['p90_s'] * 1000:.0f} ms", file=sys.stderr)
+    print(f"Latency p99:   {stats['p99_s'] * 1000:.0f} ms", file=sys.stderr)
+    print(f"Latency max:   {stats['max_s'] * 1000:.0f} ms", file=sys.stderr)
+    if server is not None:
+        counts = ", ".join(f"{k}={v}" for k, v in sorted(server.config.counts.items()))
+        print(f"Server:        {counts}", file=sys.stderr)
+        server.shutdown()
+        server.server_close()
+
+    if stats["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()